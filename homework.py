@@ -1,15 +1,24 @@
+import json
 import logging
 import os
+import random
 import sys
 import time
 from http import HTTPStatus
 from json import JSONDecodeError
+from pathlib import Path
 
 import requests
-import telegram
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from requests import RequestException, Response
-from telegram import TelegramError
+from requests import RequestException
+from telegram import Bot, TelegramError
+from telegram.error import RetryAfter
+from telegram.ext import Updater
+from telegram.ext import messagequeue as mq
+from telegram.utils.request import Request
+from tenacity import (retry, retry_if_exception, retry_if_exception_type,
+                      stop_after_attempt, wait_exponential_jitter)
 
 from exceptions import NotForSendError
 
@@ -19,8 +28,26 @@ PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
+MODE = os.getenv('MODE', 'polling')
+PUBLIC_URL = os.getenv('PUBLIC_URL')
+WEBHOOK_PORT = int(os.getenv('PORT', 8443))
+STATE_PATH = Path(os.getenv('STATE_PATH', '.state.json'))
+
 RETRY_TIME = 600
+MIN_RETRY_TIME = 30
+MAX_RETRY_TIME = 3600
+RETRY_JITTER = 30
+POLLING_TIMEOUT = 50
+MESSAGES_BURST_LIMIT = 29
+MESSAGES_TIME_LIMIT_MS = 1017
+SEND_ATTEMPTS = 5
+MAX_SEND_WAIT = 30
+REQUEST_ATTEMPTS = 3
+TRANSIENT_API_ERRORS = (requests.ConnectionError, requests.Timeout)
+ERRORS_CACHE_SIZE = 128
+ERRORS_CACHE_TTL = 6 * 60 * 60
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+API_TIMEOUT = (5, 15)
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
 HOMEWORK_VERDICTS = {
@@ -28,41 +55,146 @@ HOMEWORK_VERDICTS = {
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+STATUS_MESSAGE = 'Изменился статус проверки работы "{}". {}'
 
 logger = logging.getLogger(__name__)
 
+_sent_errors = TTLCache(maxsize=ERRORS_CACHE_SIZE, ttl=ERRORS_CACHE_TTL)
+_last_statuses = {}
+_api_cache = {'from_date': None, 'etag': None,
+              'last_modified': None, 'data': None}
+
+
+def is_short_flood_wait(error):
+    """Проверяет, что Telegram просит подождать не дольше MAX_SEND_WAIT."""
+    return isinstance(error, RetryAfter) and error.retry_after <= MAX_SEND_WAIT
+
+
+def wait_telegram_retry(retry_state):
+    """Выдерживает паузу, которую просит Telegram."""
+    return retry_state.outcome.exception().retry_after
+
+
+class MQBot(Bot):
+    """Бот, отправляющий сообщения через очередь с ограничением частоты."""
+
+    def __init__(self, *args, mqueue=None, **kwargs):
+        """Создаёт бота и очередь исходящих сообщений."""
+        super().__init__(*args, **kwargs)
+        self._is_messages_queued_default = True
+        self._msg_queue = mqueue or mq.MessageQueue(
+            all_burst_limit=MESSAGES_BURST_LIMIT,
+            all_time_limit_ms=MESSAGES_TIME_LIMIT_MS
+        )
+
+    def stop_queue(self):
+        """Останавливает потоки очереди сообщений."""
+        self._msg_queue.stop()
+
+    @mq.queuedmessage
+    def send_message(self, *args, **kwargs):
+        """Ставит сообщение в очередь на отправку."""
+        return super().send_message(*args, **kwargs)
+
+
+@retry(stop=stop_after_attempt(SEND_ATTEMPTS),
+       wait=wait_telegram_retry,
+       retry=retry_if_exception(is_short_flood_wait),
+       reraise=True)
+def deliver_message(bot, message):
+    """Ставит сообщение в очередь и ждёт его доставки.
+
+    Повторы выполняются вне потока очереди, чтобы пауза перед ними
+    не задерживала остальные сообщения.
+    """
+    return bot.send_message(TELEGRAM_CHAT_ID, message, isgroup=False).result()
+
 
 def send_message(bot, message):
     """Отправляет сообщение."""
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        deliver_message(bot, message)
     except TelegramError as error:
         raise NotForSendError('Сообщение с текстом: '
                               f'{message} не отправлено ошибка:{error}')
     else:
-        logger.info('Сообщение успешно отправлено')
+        logger.info('Сообщение отправлено в чат %s: %s',
+                    TELEGRAM_CHAT_ID, message)
+
+
+def send_statuses(bot, updates):
+    """Отправляет сообщения о статусах по порядку, не прерываясь на ошибках.
+
+    Статус работы запоминается только после доставки сообщения о нём.
+    Возвращает True, если все сообщения доставлены.
+    """
+    delivered = True
+    for homework, message in updates:
+        try:
+            send_message(bot, message)
+        except NotForSendError as error:
+            logger.error(error, exc_info=True)
+            delivered = False
+        else:
+            remember_status(homework)
+    return delivered
+
+
+def conditional_headers(current_timestamp):
+    """Добавляет к заголовкам запроса валидаторы закэшированного ответа."""
+    if _api_cache['from_date'] != current_timestamp:
+        return HEADERS
+    headers = dict(HEADERS)
+    if _api_cache['etag']:
+        headers['If-None-Match'] = _api_cache['etag']
+    if _api_cache['last_modified']:
+        headers['If-Modified-Since'] = _api_cache['last_modified']
+    return headers
+
+
+def cache_api_answer(current_timestamp, response, data):
+    """Запоминает ответ API вместе с его ETag и Last-Modified."""
+    _api_cache.update(from_date=current_timestamp,
+                      etag=response.headers.get('ETag'),
+                      last_modified=response.headers.get('Last-Modified'),
+                      data=data)
+
+
+@retry(stop=stop_after_attempt(REQUEST_ATTEMPTS),
+       wait=wait_exponential_jitter(initial=1, max=10),
+       retry=retry_if_exception_type(TRANSIENT_API_ERRORS),
+       reraise=True)
+def request_api(**params):
+    """Выполняет запрос к API, повторяя его при сетевых сбоях."""
+    return requests.get(**params)
 
 
 def get_api_answer(current_timestamp):
     """Получает словарь с данными о домашней работе."""
     response_params = {'url': ENDPOINT,
-                       'headers': {'Authorization':
-                                   f'OAuth {PRACTICUM_TOKEN}'},
-                       'params': {'from_date': current_timestamp}}
+                       'headers': conditional_headers(current_timestamp),
+                       'params': {'from_date': current_timestamp},
+                       'timeout': API_TIMEOUT}
     try:
-        response = requests.get(**response_params)
-        if response.status_code != HTTPStatus.OK:
-            Response.raise_for_status(response)
-
-    except RequestException:
+        response = request_api(**response_params)
+    except RequestException as error:
+        raise RequestException(f'Ошибка {type(error).__name__} при попытке '
+                               'запроса к API с параметрами '
+                               f'{response_params}') from error
+    if response.status_code == HTTPStatus.NOT_MODIFIED:
+        logger.debug('Ответ API не изменился, используется кэш')
+        return _api_cache['data']
+    if response.status_code != HTTPStatus.OK:
         raise RequestException((f'Ошибка {response.status_code} '
                                 'при попытке запроса к API с параметрами'
                                 f' {response_params}'))
     try:
-        return response.json()
+        data = response.json()
     except JSONDecodeError as error:
         raise ValueError(f'Ошибка {error} запрос к API с параметрами'
                          f' {response_params} вернул невалидный json')
+    cache_api_answer(current_timestamp, response, data)
+    return data
 
 
 def check_response(response):
@@ -73,27 +205,38 @@ def check_response(response):
     homeworks = response.get('homeworks')
     if homeworks is None:
         raise KeyError('В ответе от API отсутствует ключ homeworks')
-    if type(homeworks) is not list:
+    if not isinstance(homeworks, list):
         raise TypeError('По ключу homeworks находится не список')
-    if response.get('current_date') is None:
+    current_date = response.get('current_date')
+    if current_date is None:
         raise NotForSendError('В ответе от API отсутствует ключ current_date')
-    if not isinstance((response.get('current_date')), int):
+    if not isinstance(current_date, int):
         raise NotForSendError('По ключу current_date находится не число')
     return homeworks
 
 
 def parse_status(homework):
-    """Извлекает статус домашней работы из словаря."""
+    """Извлекает статус домашней работы из словаря.
+
+    Если статус работы не изменился с прошлой проверки, возвращает None.
+    """
     homework_name = homework.get('homework_name')
     if homework_name is None:
         raise KeyError('В словаре отсутствует ключ homework_name')
     homework_status = homework.get('status')
     if homework_status is None:
         raise KeyError('В словаре отсутствует ключ homework_name')
-    if homework_status not in HOMEWORK_VERDICTS:
+    verdict = HOMEWORK_VERDICTS.get(homework_status)
+    if verdict is None:
         raise ValueError('Непредвиденный статус домашней работы')
-    verdict = HOMEWORK_VERDICTS[homework_status]
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    if _last_statuses.get(homework_name) == homework_status:
+        return None
+    return STATUS_MESSAGE.format(homework_name, verdict)
+
+
+def remember_status(homework):
+    """Запоминает статус работы, о котором отправлено сообщение."""
+    _last_statuses[homework['homework_name']] = homework['status']
 
 
 def check_tokens():
@@ -101,35 +244,171 @@ def check_tokens():
     return all([PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID])
 
 
+def is_new_error(message):
+    """Проверяет, что сообщение об ошибке недавно не отправлялось."""
+    if message in _sent_errors:
+        logger.debug('Сообщение об ошибке уже отправлено, повтор пропущен')
+        return False
+    _sent_errors[message] = True
+    return True
+
+
+def load_timestamp():
+    """Возвращает сохранённую метку времени последней проверки."""
+    try:
+        timestamp = json.loads(STATE_PATH.read_text())['ts']
+        if not isinstance(timestamp, int):
+            raise TypeError(f'метка времени {timestamp!r} не является числом')
+        return timestamp
+    except FileNotFoundError:
+        return int(time.time())
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        logger.warning('Не удалось прочитать %s: %s', STATE_PATH, error)
+        return int(time.time())
+
+
+def save_timestamp(timestamp):
+    """Атомарно сохраняет метку времени последней проверки."""
+    tmp_path = STATE_PATH.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps({'ts': timestamp}))
+    tmp_path.replace(STATE_PATH)
+
+
+def next_interval(state):
+    """Вычисляет задержку до следующего запроса к API.
+
+    После ошибок подряд задержка растёт экспоненциально до MAX_RETRY_TIME
+    и получает случайную добавку, чтобы не нагружать API во время сбоя.
+    """
+    if not state['errors']:
+        return state['interval']
+    backoff = min(RETRY_TIME * 2 ** state['errors'], MAX_RETRY_TIME)
+    return backoff + random.uniform(0, RETRY_JITTER)
+
+
+def report_error(context, error):
+    """Логирует ошибку и сообщает о ней в Telegram, если она новая."""
+    message = f'Сбой в работе программы: {error}'
+    logger.error(message, exc_info=True)
+    if is_new_error(message):
+        context.dispatcher.run_async(send_message, context.bot, message)
+
+
+def collect_messages(context, homeworks):
+    """Собирает пары из работы и сообщения о её новом статусе.
+
+    Некорректные работы пропускаются, ошибка о них отправляется отдельно.
+    """
+    updates = []
+    for homework in homeworks:
+        try:
+            message = parse_status(homework)
+        except (KeyError, ValueError) as error:
+            report_error(context, error)
+            continue
+        if message:
+            updates.append((homework, message))
+    return updates
+
+
+def check_homework(context):
+    """Проверяет статус работы и планирует следующую проверку.
+
+    Пока API присылает пустой список работ, интервал между запросами
+    удваивается вплоть до RETRY_TIME, после изменения статуса
+    снова сбрасывается до MIN_RETRY_TIME. Метка времени сдвигается только
+    после доставки всех сообщений, иначе изменения запрашиваются повторно,
+    а недоставка считается ошибкой для увеличения паузы. Следующая
+    проверка планируется после отправки, поэтому медленная доставка
+    откладывает и следующий запрос к API.
+    """
+    state = context.job.context
+    try:
+        response = get_api_answer(state['timestamp'])
+        homeworks = check_response(response)
+        if len(homeworks) == 0:
+            logger.debug('Статус работы не изменился')
+            state['interval'] = min(state['interval'] * 2, RETRY_TIME)
+            state['errors'] = 0
+        elif send_statuses(context.bot, collect_messages(context, homeworks)):
+            state['interval'] = MIN_RETRY_TIME
+            state['timestamp'] = response.get('current_date')
+            save_timestamp(state['timestamp'])
+            state['errors'] = 0
+        else:
+            state['errors'] += 1
+    except NotForSendError as error:
+        state['errors'] += 1
+        logger.error('Сбой в работе программы: %s', error, exc_info=True)
+    except Exception as error:
+        state['errors'] += 1
+        report_error(context, error)
+    finally:
+        context.job_queue.run_once(
+            check_homework, next_interval(state), context=state
+        )
+
+
+def handle_error(update, context):
+    """Логирует ошибки, возникшие в обработчиках и асинхронных задачах."""
+    logger.error('Сбой в работе программы: %s', context.error,
+                 exc_info=context.error)
+
+
+def start_updates(updater):
+    """Запускает получение обновлений от Telegram.
+
+    В режиме webhook бот ждёт запросов от Telegram на PUBLIC_URL,
+    без PUBLIC_URL используется long polling.
+    """
+    if MODE == 'webhook' and PUBLIC_URL:
+        updater.start_webhook(
+            listen='0.0.0.0',
+            port=WEBHOOK_PORT,
+            url_path=TELEGRAM_TOKEN,
+            webhook_url=f'{PUBLIC_URL.rstrip("/")}/{TELEGRAM_TOKEN}'
+        )
+        logger.info('Бот запущен в режиме webhook')
+        return
+    if MODE == 'webhook':
+        logger.warning('Не задан PUBLIC_URL, бот запущен в режиме polling')
+    updater.start_polling(poll_interval=0, timeout=POLLING_TIMEOUT)
+
+
+def send_alert(message):
+    """Отправляет сообщение до запуска бота, если хватает токенов Telegram."""
+    if not (TELEGRAM_TOKEN and TELEGRAM_CHAT_ID):
+        return
+    try:
+        bot = MQBot(token=TELEGRAM_TOKEN)
+    except TelegramError as error:
+        logger.error('Не удалось создать бота: %s', error)
+        return
+    try:
+        send_message(bot, message)
+    except NotForSendError as error:
+        logger.error(error)
+    finally:
+        bot.stop_queue()
+
+
 def main():
     """Основная логика работы бота."""
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
     if not check_tokens():
         message = 'Отсутствует одна из переменных окружения'
         logger.critical(message)
-        send_message(bot, message)
+        send_alert(message)
         sys.exit(1)
 
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            homework = check_response(response)
-            if len(homework) == 0:
-                logger.debug('Статус работы не изменился')
-                continue
-            message = parse_status(homework[0])
-            send_message(bot, message)
-            current_timestamp = response.get('current_date')
-        except NotForSendError as error:
-            message = f'Сбой в работе программы: {error}'
-            logger.error(message, exc_info=True)
-        except Exception as error:
-            message = f'Сбой в работе программы: {error}'
-            logger.error(message, exc_info=True)
-            send_message(bot, message)
-        finally:
-            time.sleep(RETRY_TIME)
+    bot = MQBot(token=TELEGRAM_TOKEN, request=Request(con_pool_size=8))
+    updater = Updater(bot=bot)
+    updater.dispatcher.add_error_handler(handle_error)
+    state = {'timestamp': load_timestamp(), 'interval': MIN_RETRY_TIME,
+             'errors': 0}
+    updater.job_queue.run_once(check_homework, 0, context=state)
+    start_updates(updater)
+    updater.idle()
+    bot.stop_queue()
 
 
 if __name__ == '__main__':
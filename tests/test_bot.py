@@ -1,6 +1,8 @@
 import os
 from http import HTTPStatus
+from types import SimpleNamespace
 
+import pytest
 import requests
 import telegram
 import utils
@@ -44,6 +46,7 @@ class MockResponseGET:
         )
         self.random_timestamp = random_timestamp
         self.status_code = http_status
+        self.headers = {}
 
     def json(self):
         data = {
@@ -73,6 +76,89 @@ class MockTelegramBot:
         return self.random_timestamp
 
 
+class StubPromise:
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return True
+
+
+class StubBot:
+
+    def __init__(self, errors=None):
+        self.messages = []
+        self.errors = list(errors or [])
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.messages.append(text)
+        return StubPromise(self.errors.pop(0) if self.errors else None)
+
+
+class StubJobQueue:
+
+    def __init__(self):
+        self.scheduled = []
+
+    def run_once(self, callback, when, context=None, **kwargs):
+        self.scheduled.append((callback, when, context))
+
+
+class StubDispatcher:
+
+    def run_async(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+class StubContext:
+
+    def __init__(self, state, bot=None):
+        self.job = SimpleNamespace(context=state)
+        self.bot = bot or StubBot()
+        self.job_queue = StubJobQueue()
+        self.dispatcher = StubDispatcher()
+
+
+class StubUpdater:
+
+    def __init__(self):
+        self.webhooks = []
+        self.pollings = []
+
+    def start_webhook(self, **kwargs):
+        self.webhooks.append(kwargs)
+
+    def start_polling(self, **kwargs):
+        self.pollings.append(kwargs)
+
+
+def make_state(timestamp, interval=30, errors=0):
+    return {'timestamp': timestamp, 'interval': interval, 'errors': errors}
+
+
+def mock_homeworks_get(homeworks, random_timestamp, current_timestamp):
+    def mock_response_get(*args, **kwargs):
+        response = MockResponseGET(
+            *args, random_timestamp=random_timestamp,
+            current_timestamp=current_timestamp,
+            **kwargs
+        )
+
+        def valid_response_json():
+            return {
+                "homeworks": homeworks,
+                "current_date": random_timestamp
+            }
+
+        response.json = valid_response_json
+        return response
+
+    return mock_response_get
+
+
 class TestHomework:
     HOMEWORK_STATUSES = {
         'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -640,3 +726,468 @@ class TestHomework:
                 f'Убедитесь, что в функции `{func_name}` обрабатываете ситуацию, '
                 'когда API возвращает код, отличный от 200'
             )
+
+    def test_get_api_answer_not_modified(self, monkeypatch, random_timestamp,
+                                         current_timestamp, api_url):
+        request_headers = []
+
+        def mock_response_get(*args, **kwargs):
+            request_headers.append(dict(kwargs['headers']))
+            response = MockResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp,
+                **kwargs
+            )
+            response.headers = {'ETag': '"abc"'}
+            if 'If-None-Match' in kwargs['headers']:
+                response.status_code = HTTPStatus.NOT_MODIFIED
+
+                def json_empty():
+                    raise ValueError('Ответ 304 не содержит тела')
+
+                response.json = json_empty
+            return response
+
+        monkeypatch.setattr(requests, 'get', mock_response_get)
+
+        import homework
+
+        func_name = 'get_api_answer'
+        first = homework.get_api_answer(current_timestamp)
+        second = homework.get_api_answer(current_timestamp)
+        assert request_headers[1].get('If-None-Match') == '"abc"', (
+            f'Проверьте, что функция `{func_name}` передаёт ETag '
+            'предыдущего ответа в заголовке If-None-Match'
+        )
+        assert second == first, (
+            f'Проверьте, что функция `{func_name}` при ответе 304 '
+            'возвращает закэшированный ответ API'
+        )
+
+    def test_error_message_not_repeated(self, random_timestamp):
+        import homework
+
+        func_name = 'is_new_error'
+        message = f'Сбой в работе программы: {random_timestamp}'
+        assert homework.is_new_error(message), (
+            f'Проверьте, что функция `{func_name}` пропускает '
+            'первое сообщение об ошибке'
+        )
+        assert not homework.is_new_error(message), (
+            f'Проверьте, что функция `{func_name}` не пропускает '
+            'повторное сообщение о той же ошибке'
+        )
+
+    def test_timestamp_saved_between_runs(self, monkeypatch, tmp_path,
+                                          random_timestamp):
+        import homework
+
+        monkeypatch.setattr(homework, 'STATE_PATH', tmp_path / 'state.json')
+        homework.save_timestamp(random_timestamp)
+        assert homework.load_timestamp() == random_timestamp, (
+            'Проверьте, что метка времени, сохранённая функцией '
+            '`save_timestamp`, возвращается функцией `load_timestamp`'
+        )
+
+    def test_parse_status_unchanged(self, random_timestamp):
+        test_data = {
+            "status": "reviewing",
+            "homework_name": f'unchanged_{random_timestamp}',
+        }
+
+        import homework
+
+        func_name = 'parse_status'
+        assert homework.parse_status(test_data), (
+            f'Проверьте, что функция `{func_name}` возвращает сообщение '
+            'при первом получении статуса работы'
+        )
+        assert homework.parse_status(test_data), (
+            f'Проверьте, что функция `{func_name}` возвращает сообщение, '
+            'пока о статусе работы ничего не отправлено'
+        )
+        homework.remember_status(test_data)
+        assert homework.parse_status(test_data) is None, (
+            f'Проверьте, что функция `{func_name}` возвращает None, '
+            'если статус работы не изменился'
+        )
+
+    def test_check_homework_sends_all_homeworks(self, monkeypatch, tmp_path,
+                                                random_timestamp,
+                                                current_timestamp):
+        homeworks = [
+            {'homework_name': f'first_{random_timestamp}',
+             'status': 'approved'},
+            {'homework_name': f'second_{random_timestamp}',
+             'status': 'rejected'},
+        ]
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(
+            homeworks, random_timestamp, current_timestamp
+        ))
+
+        import homework
+
+        monkeypatch.setattr(homework, 'STATE_PATH', tmp_path / 'state.json')
+        func_name = 'check_homework'
+        context = StubContext(make_state(current_timestamp))
+        homework.check_homework(context)
+        for hw in homeworks:
+            assert any(
+                message.startswith(
+                    f'Изменился статус проверки работы "{hw["homework_name"]}"'
+                ) for message in context.bot.messages
+            ), (
+                f'Проверьте, что функция `{func_name}` отправляет сообщения '
+                'обо всех работах из ответа API'
+            )
+
+    def test_check_homework_skips_invalid_homework(self, monkeypatch,
+                                                   tmp_path, random_timestamp,
+                                                   current_timestamp):
+        valid_name = f'valid_{random_timestamp}'
+        homeworks = [
+            {'homework_name': valid_name, 'status': 'approved'},
+            {'homework_name': f'invalid_{random_timestamp}',
+             'status': 'weird'},
+        ]
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(
+            homeworks, random_timestamp, current_timestamp
+        ))
+
+        import homework
+
+        monkeypatch.setattr(homework, 'STATE_PATH', tmp_path / 'state.json')
+        func_name = 'check_homework'
+        context = StubContext(make_state(current_timestamp))
+        homework.check_homework(context)
+        assert any(
+            message.startswith(
+                f'Изменился статус проверки работы "{valid_name}"'
+            ) for message in context.bot.messages
+        ), (
+            f'Проверьте, что функция `{func_name}` отправляет статус '
+            'корректной работы, даже если другая работа в ответе некорректна'
+        )
+        assert context.job.context['timestamp'] == random_timestamp, (
+            f'Проверьте, что функция `{func_name}` сдвигает метку времени '
+            'после доставки статусов корректных работ'
+        )
+
+    def test_check_homework_resends_undelivered(self, monkeypatch, tmp_path,
+                                                random_timestamp,
+                                                current_timestamp):
+        name = f'undelivered_{random_timestamp}'
+        homeworks = [{'homework_name': name, 'status': 'approved'}]
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(
+            homeworks, random_timestamp, current_timestamp
+        ))
+
+        import homework
+
+        monkeypatch.setattr(homework, 'STATE_PATH', tmp_path / 'state.json')
+        func_name = 'check_homework'
+        state = make_state(current_timestamp)
+        failing_bot = StubBot(errors=[telegram.TelegramError('Сбой')])
+        homework.check_homework(StubContext(state, bot=failing_bot))
+        assert state['timestamp'] == current_timestamp, (
+            f'Проверьте, что функция `{func_name}` не сдвигает метку '
+            'времени, если сообщение о статусе не доставлено'
+        )
+        context = StubContext(state)
+        homework.check_homework(context)
+        assert any(
+            message.startswith(f'Изменился статус проверки работы "{name}"')
+            for message in context.bot.messages
+        ), (
+            f'Проверьте, что функция `{func_name}` повторно отправляет '
+            'статус, который не удалось доставить'
+        )
+
+    def test_send_message_retries_retry_after(self, monkeypatch):
+        import homework
+
+        func_name = 'send_message'
+        sleeps = []
+        monkeypatch.setattr(homework.deliver_message.retry, 'sleep',
+                            sleeps.append)
+        bot = StubBot(errors=[telegram.error.RetryAfter(5)])
+        homework.send_message(bot, 'Сообщение')
+        assert len(bot.messages) == 2, (
+            f'Проверьте, что функция `{func_name}` повторяет отправку, '
+            'если Telegram ответил RetryAfter'
+        )
+        assert sleeps == [5], (
+            f'Проверьте, что функция `{func_name}` ждёт время из RetryAfter'
+        )
+
+        bot = StubBot(errors=[telegram.error.RetryAfter(1000)])
+        with pytest.raises(homework.NotForSendError):
+            homework.send_message(bot, 'Сообщение')
+        assert len(bot.messages) == 1 and sleeps == [5], (
+            f'Проверьте, что функция `{func_name}` не повторяет отправку, '
+            'если Telegram просит ждать дольше MAX_SEND_WAIT'
+        )
+
+    def test_send_message_not_retries_bad_request(self, monkeypatch):
+        import homework
+
+        func_name = 'send_message'
+        monkeypatch.setattr(homework.deliver_message.retry, 'sleep',
+                            lambda seconds: None)
+        bot = StubBot(errors=[telegram.error.BadRequest('Неверный запрос')])
+        with pytest.raises(homework.NotForSendError):
+            homework.send_message(bot, 'Сообщение')
+        assert len(bot.messages) == 1, (
+            f'Проверьте, что функция `{func_name}` не повторяет отправку '
+            'при ошибке BadRequest'
+        )
+
+    def test_request_api_retries_connection_error(self, monkeypatch):
+        calls = []
+
+        def mock_failing_get(*args, **kwargs):
+            calls.append(kwargs)
+            raise requests.ConnectionError('Нет соединения')
+
+        monkeypatch.setattr(requests, 'get', mock_failing_get)
+
+        import homework
+
+        func_name = 'request_api'
+        monkeypatch.setattr(homework.request_api.retry, 'sleep',
+                            lambda seconds: None)
+        with pytest.raises(requests.ConnectionError):
+            homework.request_api(url=homework.ENDPOINT)
+        assert len(calls) == homework.REQUEST_ATTEMPTS, (
+            f'Проверьте, что функция `{func_name}` повторяет запрос '
+            'REQUEST_ATTEMPTS раз при ошибке соединения'
+        )
+
+    def test_next_interval(self):
+        import homework
+
+        func_name = 'next_interval'
+        state = {'timestamp': 0, 'interval': 120, 'errors': 0}
+        assert homework.next_interval(state) == 120, (
+            f'Проверьте, что функция `{func_name}` без ошибок возвращает '
+            'текущий интервал опроса'
+        )
+        state['errors'] = 1
+        backoff = homework.RETRY_TIME * 2
+        assert (backoff <= homework.next_interval(state)
+                <= backoff + homework.RETRY_JITTER), (
+            f'Проверьте, что функция `{func_name}` после ошибки удваивает '
+            'RETRY_TIME и добавляет случайную задержку'
+        )
+        state['errors'] = 10
+        assert (homework.MAX_RETRY_TIME <= homework.next_interval(state)
+                <= homework.MAX_RETRY_TIME + homework.RETRY_JITTER), (
+            f'Проверьте, что функция `{func_name}` не увеличивает задержку '
+            'больше MAX_RETRY_TIME'
+        )
+
+    def test_check_homework_resets_errors(self, monkeypatch, random_timestamp,
+                                          current_timestamp):
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(
+            [], random_timestamp, current_timestamp
+        ))
+
+        import homework
+
+        func_name = 'check_homework'
+        state = make_state(current_timestamp, errors=3)
+        homework.check_homework(StubContext(state))
+        assert state['errors'] == 0, (
+            f'Проверьте, что функция `{func_name}` сбрасывает счётчик '
+            'ошибок после успешного запроса к API'
+        )
+
+    def test_check_homework_adapts_interval(self, monkeypatch, tmp_path,
+                                            random_timestamp,
+                                            current_timestamp):
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(
+            [], random_timestamp, current_timestamp
+        ))
+
+        import homework
+
+        func_name = 'check_homework'
+        state = make_state(current_timestamp, interval=homework.MIN_RETRY_TIME)
+        context = StubContext(state)
+        homework.check_homework(context)
+        assert state['interval'] == homework.MIN_RETRY_TIME * 2, (
+            f'Проверьте, что функция `{func_name}` удваивает интервал, '
+            'пока статус работы не меняется'
+        )
+        assert context.job_queue.scheduled == [
+            (homework.check_homework, state['interval'], state)
+        ], (
+            f'Проверьте, что функция `{func_name}` планирует следующую '
+            'проверку через run_once с новым интервалом'
+        )
+
+        state['interval'] = homework.RETRY_TIME - 1
+        homework.check_homework(StubContext(state))
+        assert state['interval'] == homework.RETRY_TIME, (
+            f'Проверьте, что функция `{func_name}` не увеличивает интервал '
+            'больше RETRY_TIME'
+        )
+
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(
+            [{'homework_name': f'adaptive_{random_timestamp}',
+              'status': 'reviewing'}],
+            random_timestamp, current_timestamp
+        ))
+        monkeypatch.setattr(homework, 'STATE_PATH', tmp_path / 'state.json')
+        homework.check_homework(StubContext(state))
+        assert state['interval'] == homework.MIN_RETRY_TIME, (
+            f'Проверьте, что функция `{func_name}` сбрасывает интервал '
+            'до MIN_RETRY_TIME после изменения статуса'
+        )
+
+    def test_load_timestamp_rejects_non_int(self, monkeypatch, tmp_path):
+        import homework
+
+        state_path = tmp_path / 'state.json'
+        state_path.write_text('{"ts": null}')
+        monkeypatch.setattr(homework, 'STATE_PATH', state_path)
+        assert isinstance(homework.load_timestamp(), int), (
+            'Проверьте, что функция `load_timestamp` возвращает текущее '
+            'время, если в файле состояния сохранено не число'
+        )
+
+    def test_check_homework_backs_off_when_undelivered(self, monkeypatch,
+                                                       random_timestamp,
+                                                       current_timestamp):
+        homeworks = [{'homework_name': f'blocked_{random_timestamp}',
+                      'status': 'approved'}]
+        monkeypatch.setattr(requests, 'get', mock_homeworks_get(
+            homeworks, random_timestamp, current_timestamp
+        ))
+
+        import homework
+
+        func_name = 'check_homework'
+        state = make_state(current_timestamp)
+        delays = []
+        for _ in range(2):
+            bot = StubBot(errors=[telegram.error.Unauthorized('Заблокирован')])
+            context = StubContext(state, bot=bot)
+            homework.check_homework(context)
+            delays.append(context.job_queue.scheduled[0][1])
+        assert state['errors'] == 2, (
+            f'Проверьте, что функция `{func_name}` считает недоставленные '
+            'сообщения о статусах ошибкой'
+        )
+        assert homework.RETRY_TIME < delays[0] < delays[1], (
+            f'Проверьте, что функция `{func_name}` увеличивает паузу, '
+            'пока сообщения о статусах не доставляются'
+        )
+
+    def test_connection_error_reported_once(self, monkeypatch,
+                                            current_timestamp):
+        def mock_refused_get(*args, **kwargs):
+            raise requests.ConnectionError(
+                f'<urllib3.connection.HTTPSConnection object at '
+                f'{hex(id(object()))}>: Connection refused'
+            )
+
+        monkeypatch.setattr(requests, 'get', mock_refused_get)
+
+        import homework
+
+        func_name = 'get_api_answer'
+        monkeypatch.setattr(homework.request_api.retry, 'sleep',
+                            lambda seconds: None)
+        context = StubContext(make_state(current_timestamp))
+        for _ in range(3):
+            try:
+                homework.get_api_answer(current_timestamp)
+            except requests.RequestException as error:
+                homework.report_error(context, error)
+        assert len(context.bot.messages) == 1, (
+            f'Проверьте, что ошибка соединения в функции `{func_name}` '
+            'отправляется в Telegram только один раз'
+        )
+
+    def test_main_alerts_missing_practicum_token(self, monkeypatch):
+        import homework
+
+        class StubMQBot(StubBot):
+
+            def __init__(self, token=None, **kwargs):
+                super().__init__()
+                self.stopped = False
+                bots.append(self)
+
+            def stop_queue(self):
+                self.stopped = True
+
+        bots = []
+        monkeypatch.setattr(homework, 'MQBot', StubMQBot)
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', None)
+        monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '1234:abcdefg')
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 12345)
+        with pytest.raises(SystemExit):
+            homework.main()
+        assert bots and bots[0].messages == [
+            'Отсутствует одна из переменных окружения'
+        ], (
+            'Проверьте, что при отсутствии PRACTICUM_TOKEN бот сообщает '
+            'об этом в Telegram'
+        )
+        assert bots[0].stopped, (
+            'Проверьте, что очередь сообщений бота останавливается '
+            'после отправки предупреждения'
+        )
+
+    def test_start_updates_webhook(self, monkeypatch):
+        import homework
+
+        func_name = 'start_updates'
+        monkeypatch.setattr(homework, 'MODE', 'webhook')
+        monkeypatch.setattr(homework, 'PUBLIC_URL', 'https://example.com/')
+        monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '1234:abcdefg')
+        updater = StubUpdater()
+        homework.start_updates(updater)
+        assert len(updater.webhooks) == 1 and not updater.pollings, (
+            f'Проверьте, что функция `{func_name}` в режиме webhook '
+            'запускает только webhook'
+        )
+        assert (updater.webhooks[0]['webhook_url']
+                == 'https://example.com/1234:abcdefg'), (
+            f'Проверьте, что функция `{func_name}` регистрирует webhook '
+            'по адресу PUBLIC_URL с токеном бота в пути'
+        )
+
+    def test_start_updates_webhook_without_url(self, monkeypatch):
+        import homework
+
+        func_name = 'start_updates'
+        monkeypatch.setattr(homework, 'MODE', 'webhook')
+        monkeypatch.setattr(homework, 'PUBLIC_URL', None)
+        updater = StubUpdater()
+        homework.start_updates(updater)
+        assert len(updater.pollings) == 1 and not updater.webhooks, (
+            f'Проверьте, что функция `{func_name}` без PUBLIC_URL '
+            'переходит в режим polling'
+        )
+
+    def test_start_updates_polling(self, monkeypatch):
+        import homework
+
+        func_name = 'start_updates'
+        monkeypatch.setattr(homework, 'MODE', 'polling')
+        monkeypatch.setattr(homework, 'PUBLIC_URL', 'https://example.com')
+        updater = StubUpdater()
+        homework.start_updates(updater)
+        assert not updater.webhooks, (
+            f'Проверьте, что функция `{func_name}` в режиме polling '
+            'не запускает webhook'
+        )
+        assert updater.pollings == [
+            {'poll_interval': 0, 'timeout': homework.POLLING_TIMEOUT}
+        ], (
+            f'Проверьте, что функция `{func_name}` по умолчанию запускает '
+            'long polling'
+        )